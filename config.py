@@ -23,6 +23,9 @@ SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL", "3600"))
 SCAN_DURING_MARKET_HOURS_ONLY = os.getenv("SCAN_MARKET_HOURS_ONLY", "true").lower() == "true"
 
 FMP_DAILY_LIMIT = int(os.getenv("FMP_DAILY_LIMIT", "250"))
+# Client-side pacing so scans stay under FMP's per-minute limit instead of tripping 429s
+FMP_REQUESTS_PER_SECOND = float(os.getenv("FMP_REQUESTS_PER_SECOND", "5"))
+FMP_BURST = int(os.getenv("FMP_BURST", "10"))
 
 EMA_SHORT_PERIOD = int(os.getenv("EMA_SHORT_PERIOD", "20"))
 EMA_LONG_PERIOD = int(os.getenv("EMA_LONG_PERIOD", "50"))
@@ -32,11 +35,24 @@ MIN_PRICE = float(os.getenv("MIN_PRICE", "5.0"))
 MAX_PRICE = float(os.getenv("MAX_PRICE", "500.0"))
 
 CACHE_DURATION = int(os.getenv("CACHE_DURATION", "3600"))
+# Company name/sector change at most quarterly; profiles are reused this many seconds
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", str(30 * 86400)))
+# Seconds to reuse the FMP market-hours response across status/summary messages
+MARKET_HOURS_CACHE_TTL = int(os.getenv("MARKET_HOURS_CACHE_TTL", "300"))
 
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "20"))
+# Stocks analysed concurrently within a batch; bounded to stay under FMP's per-minute limits
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "8"))
 
 RENDER_PORT = int(os.getenv("PORT", "10000"))
 
+# Public HTTPS base URL of the web wrapper; when set and the wrapper is serving, Telegram
+# pushes updates to TELEGRAM_WEBHOOK_PATH instead of the bot long-polling getUpdates.
+# WEBHOOK_SECRET is then mandatory so forged updates are rejected
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+TELEGRAM_WEBHOOK_PATH = "/telegram-webhook"
+
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL),
@@ -58,6 +74,10 @@ def validate_config():
     if MIN_MARKET_CAP >= MAX_MARKET_CAP:
         errors.append("MIN_MARKET_CAP must be less than MAX_MARKET_CAP")
     
+    # Without a secret anyone could post forged updates from an authorized chat id
+    if WEBHOOK_URL and not WEBHOOK_SECRET:
+        errors.append("WEBHOOK_SECRET is required when WEBHOOK_URL is set")
+    
     if TP_RATIO <= 0 or TP_RATIO > 0.5:
         errors.append("TP_RATIO must be between 0 and 0.5")
     
@@ -84,10 +104,11 @@ def load_watchlist(filename: str = "watchlist.txt") -> List[str]:
 
 WATCHLIST_SYMBOLS: List[str] = load_watchlist()
 
-EXCLUDED_SYMBOLS = [
+# frozenset so the per-stock exclusion check is a hash lookup however long the list grows
+EXCLUDED_SYMBOLS = frozenset([
     "GOOG",
     "META",
-]
+])
 
 def get_chat_ids() -> List[str]:
     """Get list of chat IDs from environment variable"""
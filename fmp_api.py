@@ -1,30 +1,81 @@
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
+import random
+import threading
 import time
 from collections import deque
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib decoder
+    import json
+
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
 
 class FMPAPIClient:
     BASE_URL = "https://financialmodelingprep.com/api"
     
-    def __init__(self, api_key: str, daily_limit: int = 250):
+    def __init__(self, api_key: str, daily_limit: int = 250, pool_size: int = 10,
+                 requests_per_second: float = 5.0, burst: int = 10):
         self.api_key = api_key
         self.daily_limit = daily_limit
         self.request_count = 0
         self.request_timestamps = deque(maxlen=1000)  # Track request timestamps with limit
+        # Scan workers, the background stock-list refresh and /health all touch the counters
+        self._quota_lock = threading.Lock()
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'StockSignalBot/1.0'
         })
+        # Keep one keep-alive connection per concurrent caller so parallel fetches never
+        # open and discard extra TLS connections; retries stay in _make_request
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         # Exponential backoff settings
         self.max_retries = 6  # 1s, 2s, 4s, 8s, 16s, 32s
         self.base_delay = 1.0  # Start with 1 second
+        self.backoff_jitter = 0.3  # Up to +30% random spread so parallel workers don't retry in lockstep
+        
+        # Token bucket shared by all threads using this client
+        self.requests_per_second = requests_per_second
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._tokens_at = time.monotonic()
+        self._bucket_lock = threading.Lock()
         
+    def _wait_for_token(self):
+        """Block until the token bucket allows another request"""
+        if self.requests_per_second <= 0:
+            return
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._tokens_at) * self.requests_per_second)
+            self._tokens_at = now
+            # Take the token now (possibly going negative) so waiters queue up in order
+            self._tokens -= 1
+            wait = -self._tokens / self.requests_per_second if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+    
+    def _backoff_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        # Honour the server's Retry-After (seconds form) when a 429/503 carries one, capped
+        # so a daily-quota answer can't park a scan worker for hours
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+        delay = self.base_delay * (2 ** attempt)
+        return delay * (1 + random.uniform(0, self.backoff_jitter))
+    
     def _make_request(self, endpoint: str, params: Optional[Dict] = None, cache_duration: int = 300) -> Any:
         if params is None:
             params = {}
@@ -34,23 +85,29 @@ class FMPAPIClient:
         
         for attempt in range(self.max_retries):
             try:
+                self._wait_for_token()
                 response = self.session.get(url, params=params, timeout=30)
-                self.request_count += 1
-                self.request_timestamps.append(datetime.now())  # Track request timestamp
+                with self._quota_lock:
+                    self.request_count += 1
+                    self.request_timestamps.append(datetime.now())  # Track request timestamp
                 
                 if response.status_code == 200:
-                    data = response.json()
-                    return data
+                    # Screener and price-history payloads are large; parse the raw bytes directly
+                    try:
+                        return _json_loads(response.content)
+                    except ValueError as e:
+                        # Retried like any other failed request, as response.json() errors were
+                        raise requests.exceptions.RequestException(f"Invalid JSON response: {e}")
                 elif response.status_code == 429:
                     # Rate limit hit - exponential backoff
-                    delay = self.base_delay * (2 ** attempt)
-                    logger.warning(f"Rate limit hit (429), retrying in {delay} seconds (attempt {attempt + 1}/{self.max_retries})")
+                    delay = self._backoff_delay(attempt, response)
+                    logger.warning(f"Rate limit hit (429), retrying in {delay:.1f} seconds (attempt {attempt + 1}/{self.max_retries})")
                     time.sleep(delay)
                     continue
                 elif response.status_code in [500, 502, 503, 504]:
                     # Server error - exponential backoff
-                    delay = self.base_delay * (2 ** attempt)
-                    logger.warning(f"Server error {response.status_code}, retrying in {delay} seconds")
+                    delay = self._backoff_delay(attempt, response)
+                    logger.warning(f"Server error {response.status_code}, retrying in {delay:.1f} seconds")
                     time.sleep(delay)
                     continue
                 else:
@@ -58,14 +115,14 @@ class FMPAPIClient:
                     raise requests.exceptions.RequestException(f"Status {response.status_code}")
                     
             except requests.exceptions.Timeout:
-                delay = self.base_delay * (2 ** attempt)
-                logger.warning(f"Request timeout, retrying in {delay} seconds")
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Request timeout, retrying in {delay:.1f} seconds")
                 time.sleep(delay)
                 continue
             except requests.exceptions.RequestException as e:
                 if attempt < self.max_retries - 1:
-                    delay = self.base_delay * (2 ** attempt)
-                    logger.warning(f"Request error: {e}, retrying in {delay} seconds")
+                    delay = self._backoff_delay(attempt)
+                    logger.warning(f"Request error: {e}, retrying in {delay:.1f} seconds")
                     time.sleep(delay)
                     continue
                 logger.error(f"FMP API request failed after {self.max_retries} attempts: {e}")
@@ -77,9 +134,11 @@ class FMPAPIClient:
     def get_nasdaq_stocks(self, min_market_cap: int = 500_000_000, 
                          max_market_cap: int = 50_000_000_000) -> List[Dict]:
         try:
+            # All bounds are applied server-side, so the response needs no second filtering pass
             params = {
                 'marketCapMoreThan': min_market_cap,
                 'marketCapLowerThan': max_market_cap,
+                'volumeMoreThan': 100000,
                 'exchange': 'NASDAQ',
                 'isActivelyTrading': 'true',
                 'limit': 10000  # Set high enough to get all NASDAQ stocks (max ~8000)
@@ -87,17 +146,7 @@ class FMPAPIClient:
             
             data = self._make_request('/v3/stock-screener', params)
             
-            if not data:
-                return []
-            
-            filtered = [
-                stock for stock in data
-                if stock.get('marketCap', 0) >= min_market_cap
-                and stock.get('marketCap', 0) <= max_market_cap
-                and stock.get('volume', 0) > 100000
-            ]
-            
-            return filtered
+            return data or []
             
         except Exception as e:
             logger.error(f"Failed to get NASDAQ stocks: {e}")
@@ -135,39 +184,35 @@ class FMPAPIClient:
         
         weekly_candles = []
         current_week = []
+        prev_weekday = None
         
         for day in sorted(daily_data, key=lambda x: x['date']):
-            date = datetime.strptime(day['date'], '%Y-%m-%d')
+            # Parse each date once; fromisoformat is a C fast path unlike strptime
+            weekday = date.fromisoformat(day['date'][:10]).weekday()
             
-            if not current_week:
-                current_week = [day]
-            elif date.weekday() < datetime.strptime(current_week[-1]['date'], '%Y-%m-%d').weekday():
-                weekly_candle = {
-                    'date': current_week[0]['date'],
-                    'open': current_week[0]['open'],
-                    'high': max(d['high'] for d in current_week),
-                    'low': min(d['low'] for d in current_week),
-                    'close': current_week[-1]['close'],
-                    'volume': sum(d.get('volume', 0) for d in current_week)
-                }
-                weekly_candles.append(weekly_candle)
-                current_week = [day]
-            else:
-                current_week.append(day)
+            # A weekday going backwards means a new week started
+            if current_week and weekday < prev_weekday:
+                weekly_candles.append(self._weekly_candle(current_week))
+                current_week = []
+            current_week.append(day)
+            prev_weekday = weekday
         
         if current_week:
-            weekly_candle = {
-                'date': current_week[0]['date'],
-                'open': current_week[0]['open'],
-                'high': max(d['high'] for d in current_week),
-                'low': min(d['low'] for d in current_week),
-                'close': current_week[-1]['close'],
-                'volume': sum(d.get('volume', 0) for d in current_week)
-            }
-            weekly_candles.append(weekly_candle)
+            weekly_candles.append(self._weekly_candle(current_week))
         
         return list(reversed(weekly_candles))
     
+    @staticmethod
+    def _weekly_candle(days: List[Dict]) -> Dict:
+        return {
+            'date': days[0]['date'],
+            'open': days[0]['open'],
+            'high': max(d['high'] for d in days),
+            'low': min(d['low'] for d in days),
+            'close': days[-1]['close'],
+            'volume': sum(d.get('volume', 0) for d in days)
+        }
+    
     def get_company_profile(self, symbol: str) -> Optional[Dict]:
         try:
             data = self._make_request(f'/v3/profile/{symbol}')
@@ -180,6 +225,20 @@ class FMPAPIClient:
             logger.error(f"Failed to get company profile for {symbol}: {e}")
             return None
     
+    def get_company_profiles(self, symbols: List[str], chunk_size: int = 100) -> Dict[str, Dict]:
+        """Fetch profiles for many symbols with one request per chunk of comma-separated symbols"""
+        profiles = {}
+        for i in range(0, len(symbols), chunk_size):
+            chunk = symbols[i:i + chunk_size]
+            try:
+                data = self._make_request(f"/v3/profile/{','.join(chunk)}")
+                for profile in data or []:
+                    if profile.get('symbol'):
+                        profiles[profile['symbol']] = profile
+            except Exception as e:
+                logger.error(f"Failed to get company profiles for {len(chunk)} symbols: {e}")
+        return profiles
+    
     def get_quote(self, symbol: str) -> Optional[Dict]:
         try:
             data = self._make_request(f'/v3/quote/{symbol}')
@@ -249,9 +308,10 @@ class FMPAPIClient:
         now = datetime.now()
         day_ago = now - timedelta(days=1)
         
-        # Clean up old timestamps
-        while self.request_timestamps and self.request_timestamps[0] <= day_ago:
-            self.request_timestamps.popleft()
-        
-        recent_requests = len(self.request_timestamps)
+        with self._quota_lock:
+            # Clean up old timestamps
+            while self.request_timestamps and self.request_timestamps[0] <= day_ago:
+                self.request_timestamps.popleft()
+            
+            recent_requests = len(self.request_timestamps)
         return max(0, self.daily_limit - recent_requests)
\ No newline at end of file
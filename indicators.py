@@ -4,20 +4,19 @@ from typing import List, Optional
 def compute_ema_series(prices: pd.Series, period: int) -> pd.Series:
     """
     Compute EMA with period. If not enough data => 
-    fill the earliest row with None until we can start the EMA.
+    fill the earliest row with NaN until we can start the EMA.
     """
     if len(prices) < period:
-        return pd.Series([None]*len(prices), index=prices.index)
+        return pd.Series(float('nan'), index=prices.index)
     alpha = 2.0 / (period + 1)
-    ema_values = [None]*(period-1)
-    initial_sma = prices.iloc[:period].mean()
-    ema_values.append(initial_sma)
-    for i in range(period, len(prices)):
-        prev_ema = ema_values[-1]
-        curr_val = prices.iloc[i]
-        curr_ema = curr_val * alpha + prev_ema * (1 - alpha)
-        ema_values.append(curr_ema)
-    return pd.Series(ema_values, index=prices.index)
+    # Seed with the SMA of the first `period` prices, then let pandas run the
+    # recursion y[t] = alpha*x[t] + (1-alpha)*y[t-1] (ewm with adjust=False) in C
+    seeded = prices.iloc[period-1:].astype(float)
+    seeded.iloc[0] = prices.iloc[:period].mean()
+    ema = seeded.ewm(alpha=alpha, adjust=False).mean()
+    ema_values = pd.Series(float('nan'), index=prices.index)
+    ema_values.iloc[period-1:] = ema.to_numpy()
+    return ema_values
 
 def calculate_ema(prices: List[float], period: int) -> Optional[List[float]]:
     """
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import hmac
 import os
 import threading
 import time
@@ -6,7 +7,7 @@ import logging
 from flask import Flask, jsonify, request
 from datetime import datetime
 from stock_signal_bot import StockSignalBot
-from config import RENDER_PORT
+from config import RENDER_PORT, WEBHOOK_URL, WEBHOOK_SECRET, TELEGRAM_WEBHOOK_PATH
 
 logging.basicConfig(
     level=logging.INFO,
@@ -33,7 +34,12 @@ def run_bot():
     global bot_instance, bot_status
     try:
         logger.info("Starting Stock Signal Bot in background thread...")
-        bot_instance = StockSignalBot()
+        bot_instance = StockSignalBot(serve_webhook=True)
+        # This server answers TELEGRAM_WEBHOOK_PATH, so the webhook can be registered now;
+        # if Telegram refuses it, keep commands working by polling instead
+        if WEBHOOK_URL and not bot_instance.set_webhook():
+            logger.warning("Telegram webhook registration failed; falling back to long polling")
+            bot_instance.start_polling()
         bot_status['running'] = True
         bot_status['start_time'] = datetime.now().isoformat()
         bot_instance.run()
@@ -108,6 +114,24 @@ def trigger_scan():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route(TELEGRAM_WEBHOOK_PATH, methods=['POST'])
+def telegram_webhook():
+    # Constant-time check; with no secret configured the route accepts nothing
+    token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not WEBHOOK_SECRET or not hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if not bot_instance:
+        # Telegram retries non-2xx deliveries, so the update is not lost during startup
+        return jsonify({'error': 'Bot not initialized'}), 503
+    
+    try:
+        bot_instance.handle_update(request.get_json(silent=True) or {})
+    except Exception as e:
+        logger.error(f"Error handling webhook update: {e}")
+    return jsonify({'ok': True})
+
+
 @app.route('/clear-cache', methods=['POST'])
 def clear_cache():
     auth_token = request.headers.get('Authorization')
@@ -164,6 +188,7 @@ def index():
             '/status': 'Detailed bot status',
             '/metrics': 'Prometheus metrics',
             '/trigger-scan': 'Manually trigger a scan (requires auth)',
+            TELEGRAM_WEBHOOK_PATH: 'Telegram webhook receiver (used when WEBHOOK_URL is set)',
             '/clear-cache': 'Clear data cache (requires auth)'
         }
     })
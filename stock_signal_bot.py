@@ -1,43 +1,198 @@
 #!/usr/bin/env python3
 import logging
 import time
-import schedule
 import requests
-from datetime import datetime, timedelta, timezone, time as dtime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import date, datetime, timedelta, timezone, time as dtime
 from zoneinfo import ZoneInfo
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Final
+import bisect
+import heapq
 import json
+import os
+import queue
 import signal
-import sys
-import traceback
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 from config import (
     TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID,
+    WEBHOOK_URL, WEBHOOK_SECRET, TELEGRAM_WEBHOOK_PATH,
     validate_config, format_number, get_chat_ids
 )
 from stocks import StockDataFetcher
 from decision import UpperSectionStrategy
 
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    _json_loads = json.loads
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# Scan slots (hour, minute) in America/New_York, at each session's midpoint
+SCAN_SLOTS_ET = (
+    (6, 45),   # Pre-market midpoint (04:00-09:30)
+    (12, 45),  # Regular session midpoint (09:30-16:00)
+    (18, 0),   # After-hours midpoint (16:00-20:00)
+)
+
+# Local times for the twice-daily status update
+STATUS_UPDATE_TIMES = (dtime(9, 0), dtime(21, 0))
+
+# Telegram allows roughly one message per second to a single chat
+TELEGRAM_MIN_SEND_INTERVAL = 1.0
+TELEGRAM_SEND_QUEUE_SIZE = 1000
+TELEGRAM_MAX_PARALLEL_SENDS = 8
+# On SIGINT/SIGTERM, wait at most this long (seconds) for queued messages to go out
+TELEGRAM_SHUTDOWN_DRAIN_TIMEOUT = 10
+
+# getUpdates holds the request open this long (seconds) while there is nothing to deliver
+TELEGRAM_LONG_POLL_TIMEOUT = 50
+
+# The append-only signals log is folded into the history file this often (seconds)
+SIGNALS_CONSOLIDATE_INTERVAL = 24 * 3600
+
+# Broadcast scan errors arriving within this many seconds of the last one are merged
+ERROR_SUMMARY_WINDOW = 300
+
+@lru_cache(maxsize=1)
+def _local_tz_for_hour(hour_bucket: int):
+    now = datetime.now().astimezone()
+    return now.tzinfo, now.tzname() or "Local"
+
+
+def _local_tz():
+    """Return (tzinfo, tzname) of the host zone, refreshed hourly so DST changes are picked up."""
+    return _local_tz_for_hour(int(time.time() // 3600))
+
+
+@lru_cache(maxsize=16)
+def _session_midpoints_utc(year: int, month: int, day: int) -> tuple:
+    """Return the scan slots of an ET calendar date as UTC datetimes."""
+    tz = ZoneInfo("America/New_York")
+    return tuple(
+        datetime(year, month, day, hour, minute, tzinfo=tz).astimezone(timezone.utc)
+        for hour, minute in SCAN_SLOTS_ET
+    )
+
+
+def _signal_key_time(key: str) -> datetime:
+    """Parse the timestamp of a "SYMBOL_<isoformat>" key; malformed keys sort as oldest."""
+    try:
+        return datetime.fromisoformat(key.split('_', 1)[1])
+    except (IndexError, ValueError):
+        return datetime.min
+
+
+@lru_cache(maxsize=2)
+def _scan_slot_table(year: int, month: int, day: int) -> tuple:
+    """Return the sorted UTC scan slots of the weekdays in the two weeks from an ET date."""
+    start = date(year, month, day)
+    slots = []
+    for add_days in range(14):
+        day_et = start + timedelta(days=add_days)
+        if day_et.weekday() < 5:
+            slots.extend(_session_midpoints_utc(day_et.year, day_et.month, day_et.day))
+    return tuple(slots)
+
+
+@lru_cache(maxsize=4)
+def _local_schedule_times(year: int, month: int, day: int, local_tzname: str) -> tuple:
+    """Return the scan slots of an ET calendar date as local HH:MM strings."""
+    local_tz = _local_tz()[0]
+    return tuple(t.astimezone(local_tz).strftime('%H:%M') for t in _session_midpoints_utc(year, month, day))
+
+
+# Static parts of the /help reply; only the local schedule line varies
+HELP_MESSAGE_HEAD = (
+    "📚 *Available Commands:*\n\n"
+    "/start - Start the bot\n"
+    "/help - Show this help message\n"
+    "/status - Show bot status and statistics\n"
+    "/scan - Trigger an immediate scan\n"
+    "/caprange [min] [max] - Set market cap range (in millions)\n"
+    "  Example: /caprange 500 50000\n"
+    "(i) Scans run 06:45 / 12:45 / 18:00 ET (fixed).\n"
+)
+HELP_MESSAGE_TAIL = (
+    "(i) /interval is deprecated.\n"
+    "/history - Show recent signals\n"
+    "/clear - Clear signal history\n"
+)
+
+# Static lines of the startup, scan summary and error messages
+STARTUP_MESSAGE_HEAD: Final = (
+    "🚀 *Upper Section Strategy Bot Started*",
+    "",
+    "Monitoring NASDAQ stocks for Upper Section patterns using weekly data.",
+    "• Strategy: Single Peak + Bearish Pattern + EMA Entry",
+    "• Timeframe: Weekly (1W)",
+    "• Scan Times (ET): 06:45 / 12:45 / 18:00",
+)
+STARTUP_MESSAGE_TAIL: Final = (
+    "• TP/SL: +10% / -5%",
+    "",
+    "Type /help to see available commands.",
+)
+SUMMARY_RULE: Final = "=" * 30
+LOG_RULE: Final = "=" * 50
+SCAN_SUMMARY_HEAD: Final = ("📊 *스캔 완료 보고서*", SUMMARY_RULE, "")
+SCAN_SUMMARY_NO_SIGNALS: Final = ("ℹ️ *신호 없음*", "이번 스캔에서 매수 신호를 발견하지 못했습니다.", "")
+SCAN_SUMMARY_TAIL: Final = ("", SUMMARY_RULE, "_Upper Section Strategy Bot v1.0_")
+ERROR_SUMMARY_HEAD: Final = "⚠️ *스캔 오류 발생*\n\n"
+ERROR_SUMMARY_TAIL: Final = "봇이 계속 실행 중이며 다음 스캔을 시도합니다.\n\n⏰ 다음 스캔: {next_scan}"
+# Signal alert skeleton, filled with one str.format call per part
+SIGNAL_MESSAGE_HEAD: Final = "🎯 *UPPER SECTION SIGNAL*\n\n*Symbol:* {symbol}"
+SIGNAL_MESSAGE_COMPANY: Final = "\n*Company:* {company}\n*Sector:* {sector}"
+SIGNAL_MESSAGE_BODY: Final = (
+    "\n\n📊 *Entry Setup:*"
+    "\n• Entry Price: ${entry_price:.2f}"
+    "\n• Take Profit: ${tp_price:.2f} (+{tp_pct:.0f}%)"
+    "\n• Stop Loss: ${sl_price:.2f} (-{sl_pct:.0f}%)"
+    "\n\n📈 *Signal Details:*"
+    "\n• Pattern: {pattern}"
+    "\n• Peak Date: {peak_date}"
+    "\n• EMA Period: {ema_period}"
+    "\n• Current Price: ${current_price:.2f}"
+    "\n\n⏰ Generated: {generated_at} UTC"
+)
+
 
 class StockSignalBot:
-    def __init__(self):
+    def __init__(self, serve_webhook: bool = False):
         validate_config()
         
         self.bot_token = TELEGRAM_BOT_TOKEN
-        self.chat_ids = get_chat_ids()  # Get list of chat IDs
+        # Store chat IDs as strings once so sends and auth checks need no conversion
+        self.chat_ids = tuple(str(cid) for cid in get_chat_ids())
         self.chat_id = self.chat_ids[0] if self.chat_ids else None  # Primary chat ID for commands
+        self._authorized = frozenset(self.chat_ids)
+        # Broadcast messages are not even formatted when nobody would receive them
+        self._bot_enabled = bool(self.bot_token and self.chat_ids)
         self.data_fetcher = StockDataFetcher()
         self.strategy = UpperSectionStrategy()
         
-        self.signals_sent = set()
+        self.signals_sent = {}  # "SYMBOL_<isoformat>" key -> parsed datetime
+        self._sent_symbols = set()  # Symbols present in signals_sent, for O(1) repeat checks
+        # Guards signals_sent/_sent_symbols, which the scan thread and command handlers both update
+        self._signals_lock = threading.Lock()
         self.signals_file = "signals_sent.json"
+        self.signals_log = "signals_sent.jsonl"  # One JSON key per line, appended as signals arrive
+        # Single writer for the history files, so a consolidation can't truncate a fresh append
+        self._history_lock = threading.Lock()
         self.load_signals_history()
         
         self.last_scan_time = None
@@ -45,9 +200,22 @@ class StockSignalBot:
         self.total_signals = 0
         self.start_time = datetime.now()
         
+        # Formatted schedule strings, reused until the next slot rolls over
+        self._next_scan_cache = None  # (next_utc, tzname, text)
+        self._upcoming_cache = None  # (next_utc, tzname, count, lines)
+        
+        # Broadcast error summaries held back while a coalescing window is open
+        self._error_lock = threading.Lock()
+        self._error_buffer = []
+        self._error_timer = None
+        
         self.is_running = True
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
+        self._shutdown_event = threading.Event()
+        # signal.signal only works on the main thread; the web wrapper builds the bot on a
+        # worker thread and leaves process signals to the web server
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
         
         # Configuration
         self.scan_interval = 14400  # 4 hours
@@ -58,121 +226,306 @@ class StockSignalBot:
         # Initialize last_update_id before starting thread
         self.last_update_id = None
         
-        # Start command handler thread
-        self.command_thread = threading.Thread(target=self.poll_commands, daemon=True)
-        self.command_thread.start()
+        # One pooled session so Telegram calls reuse TCP/TLS connections
+        self._http = requests.Session()
+        # Connection failures are retried for every call; status retries (honouring
+        # Retry-After) only for idempotent methods, so sendMessage is never duplicated
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        self._http.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=TELEGRAM_MAX_PARALLEL_SENDS + 1, max_retries=retry
+        ))
+        
+        # Outgoing Telegram messages are delivered by a dedicated sender thread
+        self._send_queue = queue.Queue(maxsize=TELEGRAM_SEND_QUEUE_SIZE)
+        self._last_send_at = {}  # chat_id -> monotonic time of the last send
+        # Reused for every broadcast instead of spinning up threads per message
+        self._broadcast_pool = ThreadPoolExecutor(
+            max_workers=max(1, min(TELEGRAM_MAX_PARALLEL_SENDS, len(self.chat_ids))),
+            thread_name_prefix="telegram-broadcast"
+        )
+        self.sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self.sender_thread.start()
+        
+        # Commands arrive by webhook only when the caller serves TELEGRAM_WEBHOOK_PATH
+        # (and then registers it via set_webhook); otherwise by long polling
+        self.command_thread = None
+        if not (WEBHOOK_URL and serve_webhook):
+            if WEBHOOK_URL:
+                logger.warning(
+                    f"WEBHOOK_URL is set but nothing in this process serves {TELEGRAM_WEBHOOK_PATH}; "
+                    "ignoring it and falling back to long polling"
+                )
+            self.start_polling()
+    
+    def start_polling(self):
+        """Receive commands by long polling getUpdates on a background thread"""
+        if self.command_thread is None:
+            self.command_thread = threading.Thread(target=self.poll_commands, daemon=True)
+            self.command_thread.start()
     
     def _signal_handler(self, signum, frame):
         logger.info(f"Received signal {signum}. Shutting down gracefully...")
+        # Only flip flags here: the handler runs on the main thread, possibly while it holds the
+        # send-queue or error-buffer lock, so run() does the draining once the scheduler returns
         self.is_running = False
-        self.save_signals_history()
-        sys.exit(0)
+        self._shutdown_event.set()
+    
+    def _shutdown(self):
+        """Deliver queued messages (bounded) and release the Telegram resources"""
+        # Sends are asynchronous; deliver what is queued (startup, summaries, replies) first
+        timer = self._error_timer
+        if timer is not None:
+            timer.cancel()
+            self._flush_error_summaries()
+        if not self._drain_send_queue(TELEGRAM_SHUTDOWN_DRAIN_TIMEOUT):
+            logger.warning(f"Exiting with {self._send_queue.unfinished_tasks} Telegram message(s) undelivered")
+        self._broadcast_pool.shutdown(wait=False)
+        self._http.close()
+        # Signals are already in the append log, so nothing needs rewriting here
+    
+    def _drain_send_queue(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for the sender thread to finish queued messages"""
+        deadline = time.monotonic() + timeout
+        with self._send_queue.all_tasks_done:
+            while self._send_queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._send_queue.all_tasks_done.wait(remaining)
+        return True
     
     def load_signals_history(self):
         try:
-            with open(self.signals_file, 'r') as f:
-                data = json.load(f)
-                self.signals_sent = set(data.get('signals', []))
-                logger.info(f"Loaded {len(self.signals_sent)} historical signals")
+            with open(self.signals_file, 'rb') as f:
+                # An empty file (e.g. truncated by a crash) just means no history
+                if os.fstat(f.fileno()).st_size:
+                    data = _json_loads(f.read())
+                    self.signals_sent = {key: _signal_key_time(key) for key in data.get('signals', [])}
         except FileNotFoundError:
             logger.info("No signals history file found, starting fresh")
         except Exception as e:
-            logger.error(f"Error loading signals history: {e}")
+            logger.exception(f"Error loading signals history: {e}")
+        
+        # Replay signals appended since the last consolidation
+        replayed = 0
+        try:
+            with open(self.signals_log, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        key = _json_loads(line)
+                        self.signals_sent[key] = _signal_key_time(key)
+                        replayed += 1
+                    except ValueError:
+                        # A crash can leave a partially written last line
+                        logger.warning("Skipping malformed line in signals log")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error replaying signals log: {e}")
+        
+        # Keep signals_sent oldest-first (older files were written in set order) so
+        # save_signals_history can purge aged-out entries from the front
+        self.signals_sent = dict(sorted(self.signals_sent.items(), key=lambda item: item[1]))
+        self._sent_symbols = {s.split('_', 1)[0] for s in self.signals_sent}
+        logger.info(f"Loaded {len(self.signals_sent)} historical signals")
+        if replayed:
+            self.save_signals_history()
+    
+    def _claim_signal(self, symbol: str, sent_at: datetime, sent_iso: str) -> Optional[str]:
+        """Record a signal in memory with one locked check-and-insert; None if its key is already taken"""
+        signal_key = f"{symbol}_{sent_iso}"
+        with self._signals_lock:
+            if signal_key in self.signals_sent:
+                return None
+            self.signals_sent[signal_key] = sent_at
+            self._sent_symbols.add(symbol)
+        self.total_signals += 1
+        return signal_key
+    
+    def _append_signals(self, signal_keys: List[str]):
+        """Append new signal keys to the log instead of rewriting the history file"""
+        if not signal_keys:
+            return
+        try:
+            with self._history_lock, open(self.signals_log, 'ab') as f:
+                f.write(b"".join(_json_dumps(key) + b"\n" for key in signal_keys))
+        except Exception as e:
+            logger.error(f"Error appending to signals log: {e}")
     
     def save_signals_history(self):
+        """Atomically rewrite the history file with the last 30 days and empty the log"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=30)
-            recent_signals = [
-                s for s in self.signals_sent 
-                if '_' in s and datetime.fromisoformat(s.split('_')[1]) > cutoff_date
-            ]
-            
-            with open(self.signals_file, 'w') as f:
-                json.dump({'signals': list(recent_signals)}, f)
+            with self._history_lock:
+                # Timestamps were parsed once on load/add, so pruning is a plain comparison
+                cutoff = datetime.now() - timedelta(days=30)
+                with self._signals_lock:
+                    # signals_sent is in insertion (= time) order, so only the aged-out prefix is visited
+                    expired = []
+                    for key, sent_at in self.signals_sent.items():
+                        if sent_at > cutoff:
+                            break
+                        expired.append(key)
+                    if expired:
+                        for key in expired:
+                            del self.signals_sent[key]
+                        self._sent_symbols = {s.split('_', 1)[0] for s in self.signals_sent}
+                    recent_signals = list(self.signals_sent)
+                
+                tmp_path = self.signals_file + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(_json_dumps({'signals': recent_signals}))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.signals_file)
+                # Everything in the log is now part of the history file
+                open(self.signals_log, 'wb').close()
             logger.info(f"Saved {len(recent_signals)} recent signals")
         except Exception as e:
             logger.error(f"Error saving signals history: {e}")
     
     def send_telegram_message(self, message: str, parse_mode: str = 'Markdown', chat_id: str = None):
-        """Send message to specific chat ID or all configured chat IDs"""
+        """Queue message for specific chat ID or all configured chat IDs (never blocks)"""
         if not self.chat_ids:
             logger.error("No chat IDs configured")
             return
         
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        
         # If specific chat_id provided, send only to that chat
-        target_chats = [chat_id] if chat_id else self.chat_ids
+        target_chats = (str(chat_id),) if chat_id else self.chat_ids
         
-        for target_id in target_chats:
+        try:
+            self._send_queue.put_nowait((message, parse_mode, target_chats))
+        except queue.Full:
+            logger.warning(f"Telegram send queue full, dropping message for {len(target_chats)} chat(s)")
+    
+    def _sender_loop(self):
+        """Deliver queued Telegram messages in order"""
+        while True:
+            message, parse_mode, target_chats = self._send_queue.get()
             try:
-                # Ensure chat_id is a string
-                target_id_str = str(target_id)
-                
-                # Check if bot has been added to the chat first
-                # Try to get chat info to verify bot has access
-                check_url = f"https://api.telegram.org/bot{self.bot_token}/getChat"
-                check_response = requests.post(check_url, json={'chat_id': target_id_str}, timeout=5)
-                
-                if check_response.status_code != 200:
-                    logger.error(f"Bot doesn't have access to chat {target_id_str}. User needs to start conversation with bot first.")
-                    continue
-                
-                payload = {
-                    'chat_id': target_id_str,
-                    'text': message,
-                    'parse_mode': parse_mode,
-                    'disable_web_page_preview': True
-                }
-                response = requests.post(url, json=payload, timeout=10)
-                if response.status_code == 200:
-                    logger.info(f"Telegram message sent successfully to {target_id_str}")
+                if len(target_chats) == 1:
+                    self._send_to_chat(target_chats[0], message, parse_mode)
                 else:
-                    logger.error(f"Failed to send Telegram message to {target_id_str}: {response.text}")
+                    # Broadcast to all chats concurrently so K chats cost one round-trip
+                    list(self._broadcast_pool.map(
+                        lambda target_id: self._send_to_chat(target_id, message, parse_mode),
+                        target_chats
+                    ))
             except Exception as e:
-                logger.error(f"Failed to send Telegram message to {target_id}: {e}")
+                logger.error(f"Error in Telegram sender: {e}")
+            finally:
+                self._send_queue.task_done()
     
-    def get_updates(self, offset: Optional[int] = None):
-        """Get updates from Telegram"""
+    def _send_to_chat(self, target_id: str, message: str, parse_mode: str):
+        """POST one message to one chat, pacing sends per chat"""
+        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        
+        wait = self._last_send_at.get(target_id, 0.0) + TELEGRAM_MIN_SEND_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        
+        try:
+            # Check if bot has been added to the chat first
+            # Try to get chat info to verify bot has access
+            check_url = f"https://api.telegram.org/bot{self.bot_token}/getChat"
+            check_response = self._http.post(check_url, json={'chat_id': target_id}, timeout=5)
+            
+            if check_response.status_code != 200:
+                logger.error(f"Bot doesn't have access to chat {target_id}. User needs to start conversation with bot first.")
+                return
+            
+            payload = {
+                'chat_id': target_id,
+                'text': message,
+                'parse_mode': parse_mode,
+                'disable_web_page_preview': True
+            }
+            response = self._http.post(url, json=payload, timeout=10)
+            if response.status_code == 200:
+                logger.info("Telegram message sent successfully to %s", target_id)
+            else:
+                logger.error(f"Failed to send Telegram message to {target_id}: {response.text}")
+        except Exception as e:
+            logger.error(f"Failed to send Telegram message to {target_id}: {e}")
+        finally:
+            self._last_send_at[target_id] = time.monotonic()
+    
+    def get_updates(self, offset: Optional[int] = None) -> Optional[List[Dict]]:
+        """Long-poll Telegram for updates; returns None if the request failed"""
         try:
             url = f"https://api.telegram.org/bot{self.bot_token}/getUpdates"
-            params = {'timeout': 30}
+            params = {'timeout': TELEGRAM_LONG_POLL_TIMEOUT, 'allowed_updates': '["message"]'}
             if offset:
                 params['offset'] = offset
             
-            response = requests.get(url, params=params, timeout=35)
+            # Read timeout must outlast the server-side long-poll hold
+            response = self._http.get(url, params=params, timeout=(10, TELEGRAM_LONG_POLL_TIMEOUT + 5))
             if response.status_code == 200:
                 return response.json().get('result', [])
-            return []
+            logger.error(f"Error getting updates: HTTP {response.status_code}")
+            return None
         except Exception as e:
             logger.error(f"Error getting updates: {e}")
-            return []
+            return None
+    
+    def set_webhook(self) -> bool:
+        """Register the web wrapper's endpoint so Telegram pushes updates to it"""
+        url = f"https://api.telegram.org/bot{self.bot_token}/setWebhook"
+        payload = {
+            'url': WEBHOOK_URL.rstrip('/') + TELEGRAM_WEBHOOK_PATH,
+            'allowed_updates': ['message'],
+            'secret_token': WEBHOOK_SECRET
+        }
+        try:
+            response = self._http.post(url, json=payload, timeout=10)
+            if response.status_code == 200 and response.json().get('ok'):
+                logger.info(f"Telegram webhook set to {payload['url']}")
+                return True
+            logger.error(f"Failed to set Telegram webhook: {response.text}")
+        except Exception as e:
+            logger.error(f"Failed to set Telegram webhook: {e}")
+        return False
+    
+    def handle_update(self, update: Dict):
+        """Dispatch one Telegram update, from either long polling or the webhook"""
+        update_id = update.get('update_id')
+        if update_id:
+            self.last_update_id = update_id + 1
+        
+        message = update.get('message', {})
+        text = message.get('text', '')
+        chat_id = message.get('chat', {}).get('id')
+        
+        if text.startswith('/'):
+            self.handle_command(text, chat_id)
     
     def poll_commands(self):
         """Poll for Telegram commands"""
         logger.info("Starting Telegram command polling...")
         
+        # getUpdates is rejected while a webhook is registered, e.g. after switching modes
+        try:
+            self._http.post(f"https://api.telegram.org/bot{self.bot_token}/deleteWebhook", timeout=10)
+        except Exception as e:
+            logger.warning(f"Could not clear Telegram webhook: {e}")
+        
         while self.is_running:
             try:
                 updates = self.get_updates(self.last_update_id)
+                if updates is None:
+                    # Only back off on failure; a successful long poll already waited
+                    if self._shutdown_event.wait(5):
+                        break
+                    continue
                 
                 for update in updates:
-                    update_id = update.get('update_id')
-                    if update_id:
-                        self.last_update_id = update_id + 1
-                    
-                    message = update.get('message', {})
-                    text = message.get('text', '')
-                    chat_id = message.get('chat', {}).get('id')
-                    
-                    if text.startswith('/'):
-                        self.handle_command(text, chat_id)
-                
-                time.sleep(1)
+                    self.handle_update(update)
                 
             except Exception as e:
-                logger.error(f"Error in command polling: {e}")
-                time.sleep(5)
+                logger.exception(f"Error in command polling: {e}")
+                if self._shutdown_event.wait(5):
+                    break
     
     def handle_command(self, text: str, chat_id: int):
         """Handle Telegram commands"""
@@ -182,94 +535,108 @@ class StockSignalBot:
             args = parts[1:] if len(parts) > 1 else []
             
             # Only respond to commands from authorized chats
-            if str(chat_id) not in [str(cid) for cid in self.chat_ids]:
+            chat_id = str(chat_id)
+            if chat_id not in self._authorized:
                 return
             
             if command == '/start':
                 message = "🚀 *Upper Section Strategy Bot*\n\n"
                 message += "Welcome! This bot monitors NASDAQ stocks for Upper Section patterns.\n\n"
                 message += "Type /help to see available commands."
-                self.send_telegram_message(message, chat_id=str(chat_id))
+                self.send_telegram_message(message, chat_id=chat_id)
             
             elif command == '/help':
-                message = "📚 *Available Commands:*\n\n"
-                message += "/start - Start the bot\n"
-                message += "/help - Show this help message\n"
-                message += "/status - Show bot status and statistics\n"
-                message += "/scan - Trigger an immediate scan\n"
-                message += "/caprange [min] [max] - Set market cap range (in millions)\n"
-                message += "  Example: /caprange 500 50000\n"
-                # Show ET and local schedule and deprecation note
+                # Only today's local schedule times change between calls
                 local_times = self._today_local_schedule_times()
-                message += "(i) Scans run 06:45 / 12:45 / 18:00 ET (fixed).\n"
+                local_line = ""
                 if len(local_times) == 3:
-                    message += f"    Local times today: {local_times[0]} / {local_times[1]} / {local_times[2]}\n"
-                message += "(i) /interval is deprecated.\n"
-                message += "/history - Show recent signals\n"
-                message += "/clear - Clear signal history\n"
-                self.send_telegram_message(message, chat_id=str(chat_id))
+                    local_line = f"    Local times today: {local_times[0]} / {local_times[1]} / {local_times[2]}\n"
+                message = HELP_MESSAGE_HEAD + local_line + HELP_MESSAGE_TAIL
+                self.send_telegram_message(message, chat_id=chat_id)
             
             elif command == '/status':
-                self.send_status_message(chat_id=str(chat_id))
+                self.send_status_message(chat_id=chat_id)
             
             elif command == '/scan':
                 if self.is_scanning:
-                    self.send_telegram_message("⚠️ A scan is already in progress. Please wait...", chat_id=str(chat_id))
+                    self.send_telegram_message("⚠️ A scan is already in progress. Please wait...", chat_id=chat_id)
                 else:
-                    self.send_telegram_message("🔍 Starting immediate scan...", chat_id=str(chat_id))
-                    thread = threading.Thread(target=lambda: self.scan_for_signals(requester_chat_id=str(chat_id)))
+                    self.send_telegram_message("🔍 Starting immediate scan...", chat_id=chat_id)
+                    thread = threading.Thread(target=lambda: self.scan_for_signals(requester_chat_id=chat_id))
                     thread.start()
             
             elif command == '/caprange':
-                self.handle_caprange(args, chat_id=str(chat_id))
+                self.handle_caprange(args, chat_id=chat_id)
             
             elif command == '/interval':
-                self.handle_interval(args, chat_id=str(chat_id))
+                self.handle_interval(args, chat_id=chat_id)
             
             elif command == '/history':
-                self.show_history(chat_id=str(chat_id))
+                self.show_history(chat_id=chat_id)
             
             elif command == '/clear':
-                self.signals_sent.clear()
+                with self._signals_lock:
+                    self.signals_sent.clear()
+                    self._sent_symbols.clear()
                 self.save_signals_history()
-                self.send_telegram_message("✅ Signal history cleared.", chat_id=str(chat_id))
+                self.send_telegram_message("✅ Signal history cleared.", chat_id=chat_id)
             
         except Exception as e:
-            logger.error(f"Error handling command: {e}")
+            logger.exception(f"Error handling command: {e}")
     
-    def send_status_message(self, chat_id=None):
-        """Send status message"""
+    def _render_status(self, include_market_hours: bool, include_scan_settings: bool, title: str = "Bot Status") -> str:
+        """Build the status text shared by /status and the scheduled status update."""
         uptime = datetime.now() - self.start_time
         hours = uptime.total_seconds() / 3600
         days = hours / 24
         
-        message = "📊 *Bot Status*\n\n"
-        message += f"• Uptime: {days:.1f} days ({hours:.1f} hours)\n"
-        message += f"• Total Scans: {self.total_scans}\n"
-        message += f"• Signals Found: {self.total_signals}\n"
-        message += f"• Stocks Monitored: NASDAQ\n"
-        message += f"• API Requests: {self.data_fetcher.fmp_client.request_count}\n"
-        # Show ET and today's local equivalents
+        lines = [
+            f"📊 *{title}*",
+            "",
+            f"• Uptime: {days:.1f} days ({hours:.1f} hours)",
+            f"• Total Scans: {self.total_scans}",
+            f"• Signals Found: {self.total_signals}",
+            "• Stocks Monitored: NASDAQ",
+            f"• API Requests: {self.data_fetcher.fmp_client.request_count}",
+            "• Scan Times (ET): 06:45, 12:45, 18:00",
+        ]
+        # Show today's local equivalents of the ET schedule
         local_times = self._today_local_schedule_times()
-        message += "• Scan Times (ET): 06:45, 12:45, 18:00\n"
         if len(local_times) == 3:
-            message += f"• Scan Times (Local): {local_times[0]}, {local_times[1]}, {local_times[2]}\n"
-        message += f"• Market Cap Range: ${self.min_market_cap/1e6:.0f}M - ${self.max_market_cap/1e9:.0f}B\n"
+            lines.append(f"• Scan Times (Local): {local_times[0]}, {local_times[1]}, {local_times[2]}")
+        # Only /status reports the cap range and an in-progress scan
+        if include_scan_settings:
+            lines.append(f"• Market Cap Range: ${self.min_market_cap/1e6:.0f}M - ${self.max_market_cap/1e9:.0f}B")
+            
+            if self.is_scanning:
+                lines += ["", "⚙️ *Currently scanning...*"]
         
-        if self.is_scanning:
-            message += f"\n⚙️ *Currently scanning...*\n"
+        # Market hours cost an FMP request, so only fetch them when asked for
+        if include_market_hours:
+            market_hours = self.data_fetcher.get_market_hours()
+            lines += [
+                "",
+                "🏛️ *Market Status:*",
+                f"• {'OPEN' if market_hours.get('isTheMarketOpen') else 'CLOSED'}",
+            ]
         
+        lines.append("")
         if self.last_scan_time:
-            message += f"\n⏰ Last Scan: {self.last_scan_time.strftime('%Y-%m-%d %H:%M:%S')}"
-        message += f"\n⏰ Next Scan: {self._format_next_scan_info()}"
+            lines.append(f"⏰ Last Scan: {self.last_scan_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        lines.append(f"⏰ Next Scan: {self._format_next_scan_info()}")
         # Also show the next 3 upcoming scans
         upcoming = self._upcoming_scans_info(3)
         if upcoming:
-            message += "\n🗓️ Upcoming:"
-            for s in upcoming:
-                message += f"\n• {s}"
+            lines.append("🗓️ Upcoming:")
+            lines.extend(f"• {s}" for s in upcoming)
         
-        self.send_telegram_message(message, chat_id=chat_id)
+        return "\n".join(lines)
+    
+    def send_status_message(self, chat_id=None):
+        """Send status message"""
+        self.send_telegram_message(
+            self._render_status(include_market_hours=False, include_scan_settings=True), chat_id=chat_id
+        )
     
     def handle_caprange(self, args, chat_id=None):
         """Handle caprange command"""
@@ -319,80 +686,80 @@ class StockSignalBot:
             self.send_telegram_message(f"❌ Error: {str(e)}", chat_id=chat_id)
 
     # --- Scheduling helpers (US market midpoints in ET) ---
-    def _is_weekday(self, dt_et: datetime) -> bool:
-        return dt_et.weekday() < 5
-
-    def _session_midpoints_et(self, date_et: datetime) -> List[datetime]:
-        tz = ZoneInfo("America/New_York")
-        Y, M, D = date_et.year, date_et.month, date_et.day
-        return [
-            datetime(Y, M, D, 6, 45, tzinfo=tz),  # Pre-market midpoint (04:00-09:30)
-            datetime(Y, M, D, 12, 45, tzinfo=tz), # Regular session midpoint (09:30-16:00)
-            datetime(Y, M, D, 18, 0, tzinfo=tz),  # After-hours midpoint (16:00-20:00)
-        ]
-
     def _next_scheduled_scan_utc(self, now_utc: Optional[datetime] = None) -> datetime:
         if now_utc is None:
             now_utc = datetime.now(timezone.utc)
-        tz = ZoneInfo("America/New_York")
-        now_et = now_utc.astimezone(tz)
-
-        # Search today and up to 7 days ahead
-        for add_days in range(0, 8):
-            day_et = now_et + timedelta(days=add_days)
-            date_et = datetime(day_et.year, day_et.month, day_et.day, tzinfo=tz)
-            if not self._is_weekday(date_et):
-                continue
-            for target_et in self._session_midpoints_et(date_et):
-                target_utc = target_et.astimezone(timezone.utc)
-                if target_utc > now_utc:
-                    return target_utc
+        now_et = now_utc.astimezone(ZoneInfo("America/New_York"))
+        slots = _scan_slot_table(now_et.year, now_et.month, now_et.day)
+        i = bisect.bisect_right(slots, now_utc)
+        if i < len(slots):
+            return slots[i]
         # Fallback
         return now_utc + timedelta(hours=1)
 
+    def _next_status_update(self, now: Optional[datetime] = None) -> datetime:
+        """Return the next local status update time (see STATUS_UPDATE_TIMES)."""
+        if now is None:
+            now = datetime.now()
+        for add_days in range(0, 2):
+            day = now.date() + timedelta(days=add_days)
+            for t in STATUS_UPDATE_TIMES:
+                candidate = datetime.combine(day, t)
+                if candidate > now:
+                    return candidate
+        # Fallback
+        return now + timedelta(hours=12)
+
     def _format_next_scan_info(self) -> str:
         """Return next scan time formatted with ET and Local."""
         nxt = self._next_scheduled_scan_utc()
+        local_tz, local_tzname = _local_tz()
+        cached = self._next_scan_cache
+        if cached is not None and cached[0] == nxt and cached[1] == local_tzname:
+            return cached[2]
         et_tz = ZoneInfo("America/New_York")
         nxt_et = nxt.astimezone(et_tz)
-        local_tz = datetime.now().astimezone().tzinfo
         nxt_local = nxt.astimezone(local_tz)
-        local_tzname = nxt_local.tzname() or "Local"
-        return (
+        text = (
             f"{nxt_et.strftime('%Y-%m-%d %H:%M:%S')} ET | "
             f"Local: {nxt_local.strftime('%Y-%m-%d %H:%M:%S')} {local_tzname}"
         )
+        self._next_scan_cache = (nxt, local_tzname, text)
+        return text
+
+    def _upcoming_scans_utc(self, count: int, now_utc: Optional[datetime] = None) -> List[datetime]:
+        """Return the next N scan times in UTC, sliced from the two-week slot table."""
+        if now_utc is None:
+            now_utc = datetime.now(timezone.utc)
+        now_et = now_utc.astimezone(ZoneInfo("America/New_York"))
+        # Two weeks always holds enough weekday slots for any small count
+        slots = _scan_slot_table(now_et.year, now_et.month, now_et.day)
+        i = bisect.bisect_right(slots, now_utc)
+        return list(slots[i:i + count])
 
     def _upcoming_scans_info(self, count: int = 3) -> List[str]:
         """Return a list of the next N scan times as strings with ET and Local."""
+        upcoming = self._upcoming_scans_utc(count)
+        local_tz, local_tzname = _local_tz()
+        nxt = upcoming[0] if upcoming else None
+        cached = self._upcoming_cache
+        if cached is not None and cached[:3] == (nxt, local_tzname, count):
+            return list(cached[3])
         res = []
-        now_utc = datetime.now(timezone.utc)
-        next_utc = self._next_scheduled_scan_utc(now_utc)
         et_tz = ZoneInfo("America/New_York")
-        local_tz = datetime.now().astimezone().tzinfo
-        local_tzname = datetime.now().astimezone().tzname() or "Local"
-        collected = 0
-        cursor = next_utc
-        while collected < count:
+        for cursor in upcoming:
             et_str = cursor.astimezone(et_tz).strftime('%Y-%m-%d %H:%M:%S') + " ET"
             loc_dt = cursor.astimezone(local_tz)
             loc_str = loc_dt.strftime('%Y-%m-%d %H:%M:%S') + f" {local_tzname}"
             res.append(f"{et_str} | Local: {loc_str}")
-            # Advance cursor to just after this time to find the next
-            cursor = self._next_scheduled_scan_utc(cursor + timedelta(seconds=1))
-            collected += 1
+        self._upcoming_cache = (nxt, local_tzname, count, tuple(res))
         return res
 
     def _today_local_schedule_times(self) -> List[str]:
         """Return today's ET schedule times converted to local HH:MM strings."""
-        et_tz = ZoneInfo("America/New_York")
-        local_tz = datetime.now().astimezone().tzinfo
-        now_et = datetime.now(timezone.utc).astimezone(et_tz)
-        today_et_date = datetime(now_et.year, now_et.month, now_et.day, tzinfo=et_tz)
-        local_times = []
-        for t in self._session_midpoints_et(today_et_date):
-            local_times.append(t.astimezone(local_tz).strftime('%H:%M'))
-        return local_times
+        now_et = datetime.now(ZoneInfo("America/New_York"))
+        # Keyed by ET date and local zone name, so it only recomputes daily or on DST changes
+        return list(_local_schedule_times(now_et.year, now_et.month, now_et.day, _local_tz()[1]))
     
     def show_history(self, chat_id: str = None):
         """Show signal history"""
@@ -400,49 +767,52 @@ class StockSignalBot:
             self.send_telegram_message("No signals in history yet.", chat_id=chat_id)
             return
         
-        recent_signals = sorted(list(self.signals_sent))[-10:]
+        # Ten most recent by timestamp in O(N log 10), then listed oldest first
+        with self._signals_lock:
+            latest = heapq.nlargest(10, self.signals_sent.items(), key=lambda item: item[1])
+        recent_signals = sorted(latest, key=lambda item: item[1])
         
         message = "📜 *Recent Signals:*\n\n"
-        for signal in recent_signals:
-            parts = signal.split('_')
-            if len(parts) >= 2:
-                symbol = parts[0]
-                date = parts[1][:10]
-                message += f"• {symbol} - {date}\n"
+        for signal_key, sent_at in recent_signals:
+            if '_' in signal_key:
+                symbol = signal_key.split('_', 1)[0]
+                message += f"• {symbol} - {sent_at:%Y-%m-%d}\n"
         
         self.send_telegram_message(message, chat_id=chat_id)
     
-    def format_signal_message(self, signal: Dict, stock_info: Optional[Dict] = None) -> str:
+    def format_signal_message(self, signal: Dict, stock_info: Optional[Dict] = None,
+                              generated_at: Optional[str] = None) -> str:
         symbol = signal['symbol']
+        if generated_at is None:
+            generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        message = f"🎯 *UPPER SECTION SIGNAL*\n\n"
-        message += f"*Symbol:* {symbol}\n"
+        message = SIGNAL_MESSAGE_HEAD.format(symbol=symbol)
         
         if stock_info:
-            message += f"*Company:* {stock_info.get('companyName', 'N/A')}\n"
-            message += f"*Sector:* {stock_info.get('sector', 'N/A')}\n"
+            message += SIGNAL_MESSAGE_COMPANY.format(
+                company=stock_info.get('companyName', 'N/A'),
+                sector=stock_info.get('sector', 'N/A')
+            )
             
-            if stock_info.get('marketCap'):
-                market_cap = stock_info['marketCap']
-                if market_cap >= 1e9:
-                    message += f"*Market Cap:* ${market_cap/1e9:.1f}B\n"
-                else:
-                    message += f"*Market Cap:* ${market_cap/1e6:.0f}M\n"
-        
-        message += f"\n📊 *Entry Setup:*\n"
-        message += f"• Entry Price: ${signal['entry_price']:.2f}\n"
-        message += f"• Take Profit: ${signal['tp_price']:.2f} (+{(signal['tp_ratio']*100):.0f}%)\n"
-        message += f"• Stop Loss: ${signal['sl_price']:.2f} (-{(signal['sl_ratio']*100):.0f}%)\n"
-        
-        message += f"\n📈 *Signal Details:*\n"
-        message += f"• Pattern: {signal.get('pattern', 'N/A')}\n"
-        message += f"• Peak Date: {signal.get('peak_date', 'N/A')}\n"
-        message += f"• EMA Period: {signal.get('ema_period', 'N/A')}\n"
-        message += f"• Current Price: ${signal.get('current_price', 0):.2f}\n"
-        
-        message += f"\n⏰ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} UTC"
+            market_cap = stock_info.get('marketCap')
+            if market_cap:
+                message += (
+                    f"\n*Market Cap:* ${market_cap/1e9:.1f}B" if market_cap >= 1e9
+                    else f"\n*Market Cap:* ${market_cap/1e6:.0f}M"
+                )
         
-        return message
+        return message + SIGNAL_MESSAGE_BODY.format(
+            entry_price=signal['entry_price'],
+            tp_price=signal['tp_price'],
+            tp_pct=signal['tp_ratio'] * 100,
+            sl_price=signal['sl_price'],
+            sl_pct=signal['sl_ratio'] * 100,
+            pattern=signal.get('pattern', 'N/A'),
+            peak_date=signal.get('peak_date', 'N/A'),
+            ema_period=signal.get('ema_period', 'N/A'),
+            current_price=signal.get('current_price', 0),
+            generated_at=generated_at
+        )
     
     def scan_for_signals(self, requester_chat_id: str = None):
         if self.is_scanning:
@@ -450,7 +820,7 @@ class StockSignalBot:
             return
         
         self.is_scanning = True
-        logger.info("=" * 50)
+        logger.info(LOG_RULE)
         logger.info("Starting Upper Section Strategy scan (Weekly)...")
         
         try:
@@ -469,6 +839,9 @@ class StockSignalBot:
             logger.info(f"Analyzing {len(stocks)} NASDAQ stocks with weekly data...")
             
             def process_stock(stock: Dict) -> Optional[Dict]:
+                # After SIGINT/SIGTERM, skip the rest of the scan so shutdown isn't held up
+                if not self.is_running:
+                    return None
                 try:
                     symbol = stock['symbol']
                     
@@ -479,8 +852,6 @@ class StockSignalBot:
                     signal = self.strategy.analyze(weekly_data, symbol)
                     
                     if signal:
-                        stock_info = self.data_fetcher.get_company_profile(symbol)
-                        signal['stock_info'] = stock_info
                         signal['current_price'] = stock.get('price', 0)
                         return signal
                     
@@ -496,25 +867,33 @@ class StockSignalBot:
             
             signals = [r for r in results if r is not None]
             
-            # Send all signals, but track which ones are repeated
-            repeated_signals = []
-            new_signals = []
-            for signal in signals:
-                if signal['symbol'] in [s.split('_')[0] for s in self.signals_sent]:
-                    repeated_signals.append(signal)
-                else:
-                    new_signals.append(signal)
+            # Fetch profiles for all signal symbols at once via FMP's multi-symbol endpoint
+            if signals:
+                profiles = self.data_fetcher.get_company_profiles([signal['symbol'] for signal in signals])
+                for signal in signals:
+                    signal['stock_info'] = profiles.get(signal['symbol'])
+            
+            # Send all signals, but track which ones are repeated (O(1) set lookups)
+            known = self._sent_symbols
+            new_signals = [s for s in signals if s['symbol'] not in known]
+            repeated_signals = [s for s in signals if s['symbol'] in known]
             
             # Process all signals but don't send individual messages
             if signals:
                 logger.info(f"Found {len(signals)} total signals ({len(new_signals)} new, {len(repeated_signals)} repeated)")
                 # Just track signals without sending individual messages
+                signal_keys = []
+                # One timestamp for the whole scan instead of one per signal
+                sent_at = datetime.now()
+                sent_iso = sent_at.isoformat()
                 for signal in signals:
                     symbol = signal['symbol']
-                    signal_key = f"{symbol}_{datetime.now().isoformat()}"
-                    self.signals_sent.add(signal_key)
-                    self.total_signals += 1
-                    logger.info(f"Signal found for {symbol} - Pattern: {signal.get('pattern')} - EMA{signal.get('ema_period')}")
+                    signal_key = self._claim_signal(symbol, sent_at, sent_iso)
+                    if signal_key is None:
+                        continue
+                    signal_keys.append(signal_key)
+                    logger.info("Signal found for %s - Pattern: %s - EMA%s", symbol, signal.get('pattern'), signal.get('ema_period'))
+                self._append_signals(signal_keys)
             else:
                 logger.info("No signals found in this scan")
             
@@ -524,8 +903,7 @@ class StockSignalBot:
             self.send_scan_summary(stocks, signals, new_signals, requester_chat_id)
             
         except Exception as e:
-            logger.error(f"Error during scan: {e}")
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.exception(f"Error during scan: {e}")
             # Send error summary
             self.send_error_summary(str(e), requester_chat_id)
         finally:
@@ -534,10 +912,14 @@ class StockSignalBot:
     def process_signal(self, signal: Dict):
         try:
             symbol = signal['symbol']
-            signal_key = f"{symbol}_{datetime.now().isoformat()}"
             
-            # Check if this is a repeated signal
-            is_repeated = symbol in [s.split('_')[0] for s in self.signals_sent]
+            # Check if this is a repeated signal (before claiming, which records the symbol)
+            is_repeated = symbol in self._sent_symbols
+            
+            sent_at = datetime.now()
+            signal_key = self._claim_signal(symbol, sent_at, sent_at.isoformat())
+            if signal_key is None:
+                return
             
             # Format message with repeated indicator if applicable
             message = self.format_signal_message(signal, signal.get('stock_info'))
@@ -545,52 +927,20 @@ class StockSignalBot:
                 message = "🔄 *[반복 신호]*\n" + message
             
             self.send_telegram_message(message)
-            
-            # Still add to history for tracking
-            self.signals_sent.add(signal_key)
-            self.total_signals += 1
+            self._append_signals([signal_key])
             
             logger.info(f"Signal sent for {symbol} - Pattern: {signal.get('pattern')} - EMA{signal.get('ema_period')}")
             
-            # Save history after every 5 signals
-            if len(self.signals_sent) % 5 == 0:
-                self.save_signals_history()
-            
         except Exception as e:
             logger.error(f"Error processing signal for {signal.get('symbol', 'unknown')}: {e}")
     
     def send_status_update(self):
+        if not self._bot_enabled:
+            return
         try:
-            uptime = datetime.now() - self.start_time
-            hours = uptime.total_seconds() / 3600
-            days = hours / 24
-            
-            message = "📊 *Upper Section Strategy Status*\n\n"
-            message += f"• Uptime: {days:.1f} days ({hours:.1f} hours)\n"
-            message += f"• Total Scans: {self.total_scans}\n"
-            message += f"• Signals Found: {self.total_signals}\n"
-            message += f"• Stocks Monitored: NASDAQ\n"
-            message += f"• API Requests: {self.data_fetcher.fmp_client.request_count}\n"
-            # Include ET and today's local schedule
-            local_times = self._today_local_schedule_times()
-            message += "• Scan Times (ET): 06:45, 12:45, 18:00\n"
-            if len(local_times) == 3:
-                message += f"• Scan Times (Local): {local_times[0]}, {local_times[1]}, {local_times[2]}\n"
-            
-            market_hours = self.data_fetcher.get_market_hours()
-            message += f"\n🏛️ *Market Status:*\n"
-            message += f"• {'OPEN' if market_hours.get('isTheMarketOpen') else 'CLOSED'}\n"
-            
-            if self.last_scan_time:
-                message += f"\n⏰ Last Scan: {self.last_scan_time.strftime('%Y-%m-%d %H:%M:%S')}"
-            message += f"\n⏰ Next Scan: {self._format_next_scan_info()}"
-            # Upcoming list
-            upcoming = self._upcoming_scans_info(3)
-            if upcoming:
-                message += "\n🗓️ Upcoming:"
-                for s in upcoming:
-                    message += f"\n• {s}"
-            
+            message = self._render_status(
+                include_market_hours=True, include_scan_settings=False, title="Upper Section Strategy Status"
+            )
             self.send_telegram_message(message)
             
         except Exception as e:
@@ -598,90 +948,85 @@ class StockSignalBot:
     
     def send_scan_summary(self, stocks: List[Dict], all_signals: List[Dict], new_signals: List[Dict], requester_chat_id: str = None):
         """Send comprehensive scan completion summary"""
+        if not requester_chat_id and not self._bot_enabled:
+            return
         try:
             scan_end_time = datetime.now()
             scan_duration = (scan_end_time - self.last_scan_time).total_seconds() if self.last_scan_time else 0
             
-            # Build summary message
-            message = "📊 *스캔 완료 보고서*\n"
-            message += "=" * 30 + "\n\n"
-            
-            # Scan statistics
-            message += "📈 *스캔 통계*\n"
-            message += f"• 분석한 주식: {len(stocks)}개\n"
-            message += f"• 패턴 감지: {len(all_signals)}개\n"
-            message += f"• 새로운 신호: {len(new_signals)}개\n"
-            message += f"• 소요 시간: {scan_duration:.1f}초\n\n"
-            
             # API usage
             api_requests = self.data_fetcher.fmp_client.request_count
             remaining_requests = self.data_fetcher.fmp_client.get_remaining_requests()
             daily_limit = self.data_fetcher.fmp_client.daily_limit
-            
-            message += "🔌 *API 사용량*\n"
-            message += f"• 사용: {api_requests}회\n"
-            message += f"• 남은 요청: {remaining_requests}/{daily_limit}회\n"
             usage_percent = ((daily_limit - remaining_requests) / daily_limit) * 100
-            message += f"• 일일 사용률: {usage_percent:.1f}%\n\n"
+            
+            # Build summary message line by line and join once
+            lines = [
+                *SCAN_SUMMARY_HEAD,
+                # Scan statistics
+                "📈 *스캔 통계*",
+                f"• 분석한 주식: {len(stocks)}개",
+                f"• 패턴 감지: {len(all_signals)}개",
+                f"• 새로운 신호: {len(new_signals)}개",
+                f"• 소요 시간: {scan_duration:.1f}초",
+                "",
+                "🔌 *API 사용량*",
+                f"• 사용: {api_requests}회",
+                f"• 남은 요청: {remaining_requests}/{daily_limit}회",
+                f"• 일일 사용률: {usage_percent:.1f}%",
+                "",
+            ]
             
             # Signal summary - EMA 기간별로 종목 코드 구분하여 표시
             if all_signals:
-                message += "🎯 *포착된 신호 종목*\n"
+                lines.append("🎯 *포착된 신호 종목*")
+                new_ids = {id(s) for s in new_signals}
                 
                 # EMA 기간별로 신호 분류
-                ema15_signals = [s for s in all_signals if s.get('ema_period') == 15]
-                ema33_signals = [s for s in all_signals if s.get('ema_period') == 33]
-                
-                # EMA15 신호
-                if ema15_signals:
-                    ema15_new = [s.get('symbol', 'N/A') for s in ema15_signals if s in new_signals]
-                    ema15_repeat = [s.get('symbol', 'N/A') for s in ema15_signals if s not in new_signals]
+                for ema_period, icon in ((15, "📊"), (33, "📈")):
+                    ema_signals = [s for s in all_signals if s.get('ema_period') == ema_period]
+                    if not ema_signals:
+                        continue
+                    ema_new = [s.get('symbol', 'N/A') for s in ema_signals if id(s) in new_ids]
+                    ema_repeat = [s.get('symbol', 'N/A') for s in ema_signals if id(s) not in new_ids]
                     
-                    message += f"📊 *EMA15 신호:*\n"
-                    if ema15_new:
-                        message += f"  🆕 새로운: {', '.join(ema15_new)}\n"
-                    if ema15_repeat:
-                        message += f"  🔄 반복: {', '.join(ema15_repeat)}\n"
+                    lines.append(f"{icon} *EMA{ema_period} 신호:*")
+                    if ema_new:
+                        lines.append(f"  🆕 새로운: {', '.join(ema_new)}")
+                    if ema_repeat:
+                        lines.append(f"  🔄 반복: {', '.join(ema_repeat)}")
                 
-                # EMA33 신호
-                if ema33_signals:
-                    ema33_new = [s.get('symbol', 'N/A') for s in ema33_signals if s in new_signals]
-                    ema33_repeat = [s.get('symbol', 'N/A') for s in ema33_signals if s not in new_signals]
-                    
-                    message += f"📈 *EMA33 신호:*\n"
-                    if ema33_new:
-                        message += f"  🆕 새로운: {', '.join(ema33_new)}\n"
-                    if ema33_repeat:
-                        message += f"  🔄 반복: {', '.join(ema33_repeat)}\n"
-                
-                message += "\n"
+                lines.append("")
             else:
-                message += "ℹ️ *신호 없음*\n"
-                message += "이번 스캔에서 매수 신호를 발견하지 못했습니다.\n\n"
+                lines += SCAN_SUMMARY_NO_SIGNALS
             
             # Market status and next scan
             market_hours = self.data_fetcher.get_market_hours()
             is_market_open = market_hours.get('isTheMarketOpen', False)
             
-            message += "⏰ *다음 스캔 예정*\n"
-            message += f"• 다음 스캔: {self._format_next_scan_info()}\n"
-            message += f"• 주기: 고정 스케줄 (ET)\n"
+            lines += [
+                "⏰ *다음 스캔 예정*",
+                f"• 다음 스캔: {self._format_next_scan_info()}",
+                "• 주기: 고정 스케줄 (ET)",
+            ]
             # Show next few upcoming slots
             upcoming = self._upcoming_scans_info(3)
             if upcoming:
-                message += "• 다음 일정: " + "; ".join(upcoming) + "\n"
-            message += f"• 시장 상태: {'🟢 개장' if is_market_open else '🔴 마감'}\n\n"
+                lines.append("• 다음 일정: " + "; ".join(upcoming))
+            lines += [f"• 시장 상태: {'🟢 개장' if is_market_open else '🔴 마감'}", ""]
             
             # Performance summary
             if self.total_scans > 0:
                 avg_signals_per_scan = self.total_signals / self.total_scans
-                message += "📈 *누적 성과*\n"
-                message += f"• 총 스캔: {self.total_scans}회\n"
-                message += f"• 총 신호: {self.total_signals}개\n"
-                message += f"• 평균 신호/스캔: {avg_signals_per_scan:.2f}개\n"
+                lines += [
+                    "📈 *누적 성과*",
+                    f"• 총 스캔: {self.total_scans}회",
+                    f"• 총 신호: {self.total_signals}개",
+                    f"• 평균 신호/스캔: {avg_signals_per_scan:.2f}개",
+                ]
             
-            message += "\n" + "=" * 30
-            message += "\n_Upper Section Strategy Bot v1.0_"
+            lines += SCAN_SUMMARY_TAIL
+            message = "\n".join(lines)
             
             # Send to requester only if this was a manual scan, otherwise send to all
             if requester_chat_id:
@@ -691,16 +1036,28 @@ class StockSignalBot:
             logger.info("Scan summary sent successfully")
             
         except Exception as e:
-            logger.error(f"Error sending scan summary: {e}")
+            logger.exception(f"Error sending scan summary: {e}")
     
     def send_error_summary(self, error_msg: str, requester_chat_id: str = None):
         """Send error summary when scan fails"""
+        if not requester_chat_id and not self._bot_enabled:
+            return
         try:
-            message = "⚠️ *스캔 오류 발생*\n\n"
-            message += f"오류: {error_msg[:200]}\n\n"
-            message += "봇이 계속 실행 중이며 다음 스캔을 시도합니다.\n"
+            if not requester_chat_id:
+                # Broadcast the first error right away; later ones wait for the window to close
+                with self._error_lock:
+                    if self._error_timer is not None:
+                        self._error_buffer.append(error_msg)
+                        return
+                    self._error_timer = threading.Timer(ERROR_SUMMARY_WINDOW, self._flush_error_summaries)
+                    self._error_timer.daemon = True
+                    self._error_timer.start()
             
-            message += f"\n⏰ 다음 스캔: {self._format_next_scan_info()}"
+            message = (
+                ERROR_SUMMARY_HEAD
+                + f"오류: {error_msg[:200]}\n\n"
+                + ERROR_SUMMARY_TAIL.format(next_scan=self._format_next_scan_info())
+            )
             
             if requester_chat_id:
                 self.send_telegram_message(message, chat_id=requester_chat_id)
@@ -709,79 +1066,107 @@ class StockSignalBot:
             
         except Exception as e:
             logger.error(f"Error sending error summary: {e}")
+    
+    def _flush_error_summaries(self):
+        """Broadcast one message covering the errors buffered during the window"""
+        with self._error_lock:
+            errors, self._error_buffer = self._error_buffer, []
+            self._error_timer = None
+        if not errors:
+            return
+        
+        try:
+            message = ERROR_SUMMARY_HEAD
+            message += f"최근 {ERROR_SUMMARY_WINDOW // 60}분 동안 추가 오류 {len(errors)}건\n"
+            message += f"첫 오류: {errors[0][:200]}\n"
+            if len(errors) > 1:
+                message += f"마지막 오류: {errors[-1][:200]}\n"
+            message += "\n" + ERROR_SUMMARY_TAIL.format(next_scan=self._format_next_scan_info())
+            
+            self.send_telegram_message(message)
+            
+        except Exception as e:
+            logger.error(f"Error sending error summary: {e}")
+
+    def _scheduled_scan(self):
+        """Trigger a scan at an ET session midpoint unless one is already running."""
+        if not self.is_scanning:
+            logger.info("Triggering scheduled scan at %s", datetime.now().isoformat())
+            # Run on a worker so a long scan doesn't delay status updates on the scheduler
+            threading.Thread(target=self.scan_for_signals, daemon=True).start()
+        else:
+            logger.info("Scheduled time reached but a scan is in progress; skipping this slot.")
 
-    def _scheduled_scan_loop(self):
-        """Background loop to trigger scans at ET session midpoints.
+    def _run_scheduler(self):
+        """Fire scheduled scans and status updates from a single heap of due times.
         Ensures immediate scans do not affect this schedule."""
-        logger.info("Starting fixed-time scheduled scan loop (ET midpoints)")
+        # Each job maps an epoch time to its next fire time strictly after it
+        jobs = (
+            (lambda after: self._next_scheduled_scan_utc(
+                datetime.fromtimestamp(after, timezone.utc)).timestamp(), self._scheduled_scan),
+            (lambda after: self._next_status_update(
+                datetime.fromtimestamp(after)).timestamp(), self.send_status_update),
+            (lambda after: after + SIGNALS_CONSOLIDATE_INTERVAL, self.save_signals_history),
+        )
+        
+        def entry(idx, after):
+            # Deadlines are converted to the monotonic clock once, so NTP steps
+            # do not shift the wait; the wall-clock slot is kept to pick the next one
+            wall_at = jobs[idx][0](after)
+            return (time.monotonic() + (wall_at - time.time()), idx, wall_at)
+        
+        now = time.time()
+        heap = [entry(idx, now) for idx in range(len(jobs))]
+        heapq.heapify(heap)
+        
         while self.is_running:
-            try:
-                now_utc = datetime.now(timezone.utc)
-                next_utc = self._next_scheduled_scan_utc(now_utc)
-                sleep_seconds = max(1, int((next_utc - now_utc).total_seconds()))
-                # Sleep in chunks to allow graceful shutdown
-                while self.is_running and sleep_seconds > 0:
-                    chunk = min(60, sleep_seconds)
-                    time.sleep(chunk)
-                    sleep_seconds -= chunk
-                if not self.is_running:
+            deadline, idx, wall_at = heap[0]
+            remaining = deadline - time.monotonic()
+            # Wake at the earliest due job, or immediately on shutdown
+            if remaining > 0:
+                if self._shutdown_event.wait(remaining):
                     break
-                if not self.is_scanning:
-                    logger.info(f"Triggering scheduled scan at {datetime.now().isoformat()}")
-                    self.scan_for_signals()
-                else:
-                    logger.info("Scheduled time reached but a scan is in progress; skipping this slot.")
+                continue
+            heapq.heappop(heap)
+            job = jobs[idx][1]
+            try:
+                job()
             except Exception as e:
-                logger.error(f"Error in scheduled scan loop: {e}")
-                time.sleep(30)
+                logger.error("Error in scheduled job %s: %s", job.__name__, e)
+            heapq.heappush(heap, entry(idx, max(time.time(), wall_at)))
     
     def run(self):
-        logger.info("=" * 50)
+        logger.info(LOG_RULE)
         logger.info("Upper Section Strategy Bot Started")
-        logger.info("=" * 50)
+        logger.info(LOG_RULE)
         
-        startup_message = "🚀 *Upper Section Strategy Bot Started*\n\n"
-        startup_message += "Monitoring NASDAQ stocks for Upper Section patterns using weekly data.\n"
-        startup_message += f"• Strategy: Single Peak + Bearish Pattern + EMA Entry\n"
-        startup_message += f"• Timeframe: Weekly (1W)\n"
+        lines = list(STARTUP_MESSAGE_HEAD)
         # Include ET and local schedule times for clarity
         local_times = self._today_local_schedule_times()
-        startup_message += "• Scan Times (ET): 06:45 / 12:45 / 18:00\n"
         if len(local_times) == 3:
-            startup_message += f"• Scan Times (Local): {local_times[0]} / {local_times[1]} / {local_times[2]}\n"
+            lines.append(f"• Scan Times (Local): {local_times[0]} / {local_times[1]} / {local_times[2]}")
         # Next scan in ET and local
-        startup_message += f"• Next Scan: {self._format_next_scan_info()}\n"
-        startup_message += f"• TP/SL: +10% / -5%\n"
-        startup_message += "\nType /help to see available commands."
+        lines.append(f"• Next Scan: {self._format_next_scan_info()}")
+        lines += STARTUP_MESSAGE_TAIL
+        startup_message = "\n".join(lines)
         
         self.send_telegram_message(startup_message)
         
         # Run initial scan
         self.scan_for_signals()
         
-        # Start fixed-time scheduled scan loop (ET midpoints)
-        scheduler_thread = threading.Thread(target=self._scheduled_scan_loop, daemon=True)
-        scheduler_thread.start()
-        
-        # Send status update twice daily
-        schedule.every().day.at("09:00").do(self.send_status_update)
-        schedule.every().day.at("21:00").do(self.send_status_update)
-        
         logger.info("Scheduled scans at ET midpoints: 06:45, 12:45, 18:00")
         logger.info("Telegram command polling active. Send /help for commands.")
         
-        while self.is_running:
-            try:
-                schedule.run_pending()
-                time.sleep(60)
-            except KeyboardInterrupt:
-                logger.info("Received keyboard interrupt")
-                break
-            except Exception as e:
-                logger.error(f"Unexpected error in main loop: {e}")
-                time.sleep(60)
+        # Scheduled scans and the twice-daily status update share this thread
+        try:
+            self._run_scheduler()
+        except KeyboardInterrupt:
+            logger.info("Received keyboard interrupt")
+        finally:
+            self.is_running = False
+            self._shutdown()
         
-        self.save_signals_history()
         logger.info("Upper Section Strategy Bot stopped")
 
 
@@ -1,12 +1,15 @@
+import calendar
 import logging
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import time
+from concurrent.futures import ThreadPoolExecutor
 from fmp_api import FMPAPIClient
 from config import (
     FMP_API_KEY, MIN_MARKET_CAP, MAX_MARKET_CAP,
-    MIN_VOLUME, MIN_PRICE, MAX_PRICE, BATCH_SIZE,
-    WATCHLIST_SYMBOLS, EXCLUDED_SYMBOLS, FMP_DAILY_LIMIT
+    MIN_VOLUME, MIN_PRICE, MAX_PRICE, BATCH_SIZE, SCAN_WORKERS,
+    WATCHLIST_SYMBOLS, EXCLUDED_SYMBOLS, FMP_DAILY_LIMIT, FMP_REQUESTS_PER_SECOND, FMP_BURST,
+    MARKET_HOURS_CACHE_TTL, PROFILE_CACHE_TTL
 )
 
 logger = logging.getLogger(__name__)
@@ -14,38 +17,54 @@ logger = logging.getLogger(__name__)
 
 class StockDataFetcher:
     def __init__(self):
-        self.fmp_client = FMPAPIClient(FMP_API_KEY, daily_limit=FMP_DAILY_LIMIT)
+        self.fmp_client = FMPAPIClient(
+            FMP_API_KEY, daily_limit=FMP_DAILY_LIMIT, pool_size=max(10, SCAN_WORKERS),
+            requests_per_second=FMP_REQUESTS_PER_SECOND, burst=FMP_BURST
+        )
         self.min_market_cap = MIN_MARKET_CAP
         self.max_market_cap = MAX_MARKET_CAP
+        self._market_hours_cache = None  # (monotonic fetch time, market hours dict)
+        self._profile_cache = {}  # symbol -> (monotonic fetch time, profile dict)
+        self.cached_stocks = []  # Most recent screened stock list, reported by /status
     
     def get_filtered_stocks(self, force_refresh: bool = False, min_market_cap: Optional[int] = None, max_market_cap: Optional[int] = None) -> List[Dict]:
         min_cap = min_market_cap if min_market_cap is not None else self.min_market_cap
         max_cap = max_market_cap if max_market_cap is not None else self.max_market_cap
+        stocks = self._load_filtered_stocks(min_cap, max_cap)
+        # An empty result is most likely a failed screener call, so keep the previous list
+        if stocks:
+            self.cached_stocks = stocks
+        return stocks
+    
+    def _load_filtered_stocks(self, min_cap: int, max_cap: int) -> List[Dict]:
         logger.info(f"Fetching NASDAQ stocks (Market Cap: ${min_cap:,} - ${max_cap:,})")
         
         try:
             if WATCHLIST_SYMBOLS:
                 stocks = []
-                for symbol in WATCHLIST_SYMBOLS:
-                    if symbol not in EXCLUDED_SYMBOLS:
-                        profile = self.fmp_client.get_company_profile(symbol)
-                        if profile and self._validate_stock(profile):
-                            stocks.append({
-                                'symbol': symbol,
-                                'companyName': profile.get('companyName', symbol),
-                                'marketCap': profile.get('mktCap', 0),
-                                'price': profile.get('price', 0),
-                                'volume': profile.get('volAvg', 0),
-                                'sector': profile.get('sector', 'Unknown'),
-                                'industry': profile.get('industry', 'Unknown')
-                            })
+                symbols = [symbol for symbol in WATCHLIST_SYMBOLS if symbol not in EXCLUDED_SYMBOLS]
+                # One multi-symbol request per 100 symbols instead of one per symbol; fetched
+                # fresh because validation needs current price and volume
+                profiles = self.fmp_client.get_company_profiles(symbols)
+                for symbol in symbols:
+                    profile = profiles.get(symbol)
+                    if profile and self._validate_stock(profile, min_cap, max_cap):
+                        stocks.append({
+                            'symbol': symbol,
+                            'companyName': profile.get('companyName', symbol),
+                            'marketCap': profile.get('mktCap', 0),
+                            'price': profile.get('price', 0),
+                            'volume': profile.get('volAvg', 0),
+                            'sector': profile.get('sector', 'Unknown'),
+                            'industry': profile.get('industry', 'Unknown')
+                        })
                 logger.info(f"Loaded {len(stocks)} stocks from watchlist")
             else:
                 all_stocks = self.fmp_client.get_nasdaq_stocks(min_cap, max_cap)
                 
                 stocks = []
                 for stock in all_stocks:
-                    if stock.get('symbol') not in EXCLUDED_SYMBOLS and self._validate_stock(stock):
+                    if stock.get('symbol') not in EXCLUDED_SYMBOLS and self._validate_stock(stock, min_cap, max_cap):
                         stocks.append({
                             'symbol': stock.get('symbol'),
                             'companyName': stock.get('companyName', stock.get('symbol')),
@@ -64,21 +83,16 @@ class StockDataFetcher:
             logger.error(f"Error fetching stocks: {e}")
             return []
     
-    def _validate_stock(self, stock: Dict) -> bool:
-        price = stock.get('price', 0)
-        volume = stock.get('volume', 0) or stock.get('volAvg', 0)
-        market_cap = stock.get('marketCap', 0) or stock.get('mktCap', 0)
-        
-        if price < MIN_PRICE or price > MAX_PRICE:
-            return False
-        
-        if volume < MIN_VOLUME:
-            return False
-        
-        if market_cap < self.min_market_cap or market_cap > self.max_market_cap:
-            return False
-        
-        return True
+    def _validate_stock(self, stock: Dict, min_cap: Optional[int] = None, max_cap: Optional[int] = None) -> bool:
+        # Missing (None) values count as 0 and fail the bounds instead of raising
+        get = stock.get
+        return (
+            MIN_PRICE <= (get('price') or 0) <= MAX_PRICE
+            and (get('volume') or get('volAvg') or 0) >= MIN_VOLUME
+            and (self.min_market_cap if min_cap is None else min_cap)
+                <= (get('marketCap') or get('mktCap') or 0)
+                <= (self.max_market_cap if max_cap is None else max_cap)
+        )
     
     def fetch_weekly_candles(self, symbol: str, limit: int = 52) -> Optional[List[Dict]]:
         try:
@@ -90,26 +104,26 @@ class StockDataFetcher:
                 logger.warning(f"No candle data available for {symbol}")
                 return None
             
-            formatted_candles = []
-            for candle in candles:
-                formatted_candles.append({
-                    'timestamp': self._date_to_timestamp(candle['date']),
+            to_timestamp = self._date_to_timestamp
+            return [
+                {
+                    'timestamp': to_timestamp(candle['date']),
                     'open': float(candle['open']),
                     'high': float(candle['high']),
                     'low': float(candle['low']),
                     'close': float(candle['close']),
                     'volume': float(candle.get('volume', 0))
-                })
-            
-            return formatted_candles
+                }
+                for candle in candles
+            ]
             
         except Exception as e:
             logger.error(f"Error fetching candles for {symbol}: {e}")
             return None
     
     def _date_to_timestamp(self, date_str: str) -> int:
-        dt = datetime.strptime(date_str, '%Y-%m-%d')
-        return int(dt.timestamp() * 1000)
+        # 'YYYY-MM-DD' as UTC midnight, sliced by hand instead of going through strptime
+        return calendar.timegm((int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]), 0, 0, 0)) * 1000
     
     def get_current_price(self, symbol: str) -> Optional[float]:
         try:
@@ -158,14 +172,46 @@ class StockDataFetcher:
         return self.get_filtered_stocks(force_refresh=True, min_market_cap=min_cap, max_market_cap=max_cap)
     
     def get_company_profile(self, symbol: str) -> Optional[Dict]:
-        """Get company profile for a symbol"""
-        return self.fmp_client.get_company_profile(symbol)
+        """Get company profile for a symbol, reusing it for PROFILE_CACHE_TTL seconds"""
+        cached = self._profile_cache.get(symbol)
+        if cached is not None and time.monotonic() - cached[0] < PROFILE_CACHE_TTL:
+            return cached[1]
+        profile = self.fmp_client.get_company_profile(symbol)
+        # Failed lookups are not cached so the next scan retries them
+        if profile:
+            self._profile_cache[symbol] = (time.monotonic(), profile)
+        return profile
+    
+    def get_company_profiles(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Get profiles for many symbols, fetching only cache misses in batched requests"""
+        now = time.monotonic()
+        profiles = {}
+        missing = []
+        for symbol in dict.fromkeys(symbols):
+            cached = self._profile_cache.get(symbol)
+            if cached is not None and now - cached[0] < PROFILE_CACHE_TTL:
+                profiles[symbol] = cached[1]
+            else:
+                missing.append(symbol)
+        
+        if missing:
+            fetched = self.fmp_client.get_company_profiles(missing)
+            fetched_at = time.monotonic()
+            for symbol, profile in fetched.items():
+                self._profile_cache[symbol] = (fetched_at, profile)
+            profiles.update(fetched)
+        return profiles
     
     def is_market_open(self) -> bool:
         return self.fmp_client.is_market_open()
     
     def get_market_hours(self) -> Dict:
-        return self.fmp_client.get_market_hours()
+        cached = self._market_hours_cache
+        if cached is not None and time.monotonic() - cached[0] < MARKET_HOURS_CACHE_TTL:
+            return cached[1]
+        market_hours = self.fmp_client.get_market_hours()
+        self._market_hours_cache = (time.monotonic(), market_hours)
+        return market_hours
     
     def process_stocks_in_batches(self, stocks: List[Dict], processor_func, batch_size: int = None) -> List:
         if batch_size is None:
@@ -174,28 +220,36 @@ class StockDataFetcher:
         results = []
         total = len(stocks)
         
-        for i in range(0, total, batch_size):
-            batch = stocks[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (total + batch_size - 1) // batch_size
-            
-            logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} stocks)")
-            
-            for stock in batch:
-                try:
-                    result = processor_func(stock)
-                    if result:
-                        results.append(result)
-                except Exception as e:
-                    logger.error(f"Error processing {stock.get('symbol', 'unknown')}: {e}")
-            
-            # Log remaining requests for monitoring
-            remaining_requests = self.fmp_client.get_remaining_requests()
-            if remaining_requests < 50:
-                logger.info(f"API quota status: {remaining_requests} requests remaining")
+        def process(stock: Dict):
+            try:
+                return processor_func(stock)
+            except Exception as e:
+                logger.error(f"Error processing {stock.get('symbol', 'unknown')}: {e}")
+                return None
+        
+        # Per-stock work is mostly waiting on FMP, so overlap it across a few threads;
+        # never more than a batch can use, and never more than SCAN_WORKERS requests in flight
+        with ThreadPoolExecutor(max_workers=max(1, min(SCAN_WORKERS, batch_size))) as executor:
+            for i in range(0, total, batch_size):
+                batch = stocks[i:i + batch_size]
+                batch_num = (i // batch_size) + 1
+                total_batches = (total + batch_size - 1) // batch_size
+                
+                logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} stocks)")
+                
+                # map keeps results in input order
+                results.extend(result for result in executor.map(process, batch) if result)
+                
+                # Log remaining requests for monitoring
+                remaining_requests = self.fmp_client.get_remaining_requests()
+                if remaining_requests < 50:
+                    logger.info(f"API quota status: {remaining_requests} requests remaining")
         
         return results
     
     def clear_cache(self):
         self.fmp_client.clear_cache()
+        self._profile_cache.clear()
+        self._market_hours_cache = None
+        self.cached_stocks = []
         logger.info("Stock data cache cleared")
\ No newline at end of file